@@ -1,44 +1,215 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import logging
 import os
 import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 
-import boto3
 import streamlit as st
 
+from storage import AWSStorage, LocalStorage, ReceiptStorage
+from transport import TRANSPORT_WARMUP, boto_config, start_warm_up
+from write_behind import WriteBehindQueue
+
 
 # ---------- Environment Validation ----------
+# STORAGE_BACKEND: "aws" (S3 + DynamoDB, default) or "local" (filesystem + SQLite)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "aws").lower()
+
 REQUIRED_ENV_VARS = [
     "AWS_ACCESS_KEY_ID",
     "AWS_SECRET_ACCESS_KEY",
     "AWS_REGION",
 ]
 
-for var in REQUIRED_ENV_VARS:
-    if not os.environ.get(var):
-        st.error(f"AWS 환경변수 {var} 가 설정되어 있지 않습니다.")
-        st.stop()
+if STORAGE_BACKEND == "aws":
+    for var in REQUIRED_ENV_VARS:
+        if not os.environ.get(var):
+            st.error(f"AWS 환경변수 {var} 가 설정되어 있지 않습니다.")
+            st.stop()
+elif STORAGE_BACKEND != "local":
+    st.error(f"지원하지 않는 STORAGE_BACKEND 입니다: {STORAGE_BACKEND}")
+    st.stop()
 
-AWS_REGION = os.environ["AWS_REGION"]
 S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME", "receipt-codekookiz-bucket")
 DYNAMODB_TABLE_NAME = os.environ.get("DYNAMODB_TABLE_NAME", "receipt_total")
+LOCAL_STORAGE_DIR = os.environ.get("LOCAL_STORAGE_DIR", ".receipt_store")
+
+# WRITE_BEHIND=1: queue mutations locally and write them in the background
+WRITE_BEHIND = os.environ.get("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+WRITE_BEHIND_DB = os.environ.get("WRITE_BEHIND_DB", ".receipt_queue.sqlite3")
+
+
+# ---------- Storage Backend ----------
+def create_storage() -> ReceiptStorage:
+    """Build the storage backend selected by STORAGE_BACKEND."""
+    if STORAGE_BACKEND == "local":
+        return LocalStorage(LOCAL_STORAGE_DIR)
+
+    return AWSStorage(
+        region=os.environ["AWS_REGION"],
+        bucket_name=S3_BUCKET_NAME,
+        table_name=DYNAMODB_TABLE_NAME,
+        config=boto_config(),
+    )
+
+
+storage = create_storage()
+if TRANSPORT_WARMUP:
+    start_warm_up(storage.warm_up)
+write_queue = WriteBehindQueue(storage, WRITE_BEHIND_DB) if WRITE_BEHIND else None
+
+logger = logging.getLogger(__name__)
+
+# Old receipt versions are garbage-collected off the request path
+_gc_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="receipt-gc")
+
+
+# ---------- Change Notifications ----------
+# Listeners are called with (year, month) after that month's data changed
+_change_listeners: List[Callable[[int, int], None]] = []
+
+
+def add_change_listener(listener: Callable[[int, int], None]):
+    _change_listeners.append(listener)
+
+
+def _notify_change(year: int, month: int):
+    for listener in _change_listeners:
+        listener(year, month)
+
+
+def _notify_key_change(key: str):
+    # Key format: receipts/{year}/{month}/...
+    parts = key.split("/")
+    if len(parts) > 3 and parts[1].isdigit() and parts[2].isdigit():
+        _notify_change(int(parts[1]), int(parts[2]))
+
+
+# ---------- Receipt Versions ----------
+# A month's receipts live under receipts/{year}/{month}/{version}/ and the
+# DynamoDB record's active_version points at the live one. Records without
+# active_version use the legacy layout (files directly under the month).
+def month_prefix(year: int, month: int) -> str:
+    return f"receipts/{year}/{month:02d}/"
 
 
-# ---------- AWS Clients ----------
-s3_client = boto3.client(
-    "s3",
-    region_name=AWS_REGION,
-)
+def new_receipt_version() -> str:
+    """Create a unique, time-ordered version id for a fresh upload."""
+    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+    return f"v{timestamp}_{uuid.uuid4().hex[:6]}"
 
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=AWS_REGION,
-)
 
-receipt_table = dynamodb.Table(DYNAMODB_TABLE_NAME)
+def get_active_version(year: int, month: int) -> Optional[str]:
+    """Return the month's active version, or None for the legacy layout."""
+    record = get_monthly_total_from_dynamodb(year, month)
+    return record.get("active_version") if record else None
+
+
+def filter_version_keys(
+    keys: List[str],
+    year: int,
+    month: int,
+    version: Optional[str],
+) -> List[str]:
+    """Keep only the keys of a month listing that belong to one version."""
+    prefix = month_prefix(year, month)
+
+    if version:
+        version_prefix = f"{prefix}{version}/"
+        return [key for key in keys if key.startswith(version_prefix)]
+
+    # Legacy layout: only files directly under the month prefix
+    return [
+        key for key in keys
+        if key.startswith(prefix) and "/" not in key[len(prefix):]
+    ]
+
+
+def list_version_keys(year: int, month: int, version: Optional[str]) -> List[str]:
+    """List the receipt keys stored under one version of a month."""
+    prefix = month_prefix(year, month)
+
+    if version:
+        keys = storage.list_receipts(f"{prefix}{version}/")
+    else:
+        keys = filter_version_keys(storage.list_receipts(prefix), year, month, None)
+
+    if write_queue is None:
+        return keys
+
+    # Include writes that are still waiting in the queue
+    puts, deletes = write_queue.pending_receipts(prefix)
+    pending = filter_version_keys(sorted(puts), year, month, version)
+    return [key for key in keys if key not in deletes and key not in puts] + pending
+
+
+def activate_receipt_version(
+    year: int,
+    month: int,
+    version: str,
+    previous_version: Optional[str],
+    total_amount: int,
+    receipt_count: int,
+) -> bool:
+    """
+    Atomically switch the month to a new version with a single conditional
+    write. Returns False if another run changed the version in the meantime.
+    """
+    activated = storage.put_total_if_version(
+        {
+            "year": year,
+            "month": month,
+            "total_amount": total_amount,
+            "receipt_count": receipt_count,
+            "active_version": version,
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+        },
+        expected_version=previous_version,
+    )
+
+    if activated:
+        # A queued total update for this month would overwrite the new totals
+        if write_queue is not None:
+            write_queue.discard_total(year, month)
+        _notify_change(year, month)
+
+    return activated
+
+
+def delete_version_in_background(year: int, month: int, version: Optional[str]):
+    """Garbage-collect all receipts of an inactive version without blocking."""
+    def _collect():
+        keys = list_version_keys(year, month, version)
+        if not keys:
+            return
+
+        # Queued deletes also cancel uploads of this version still pending
+        if write_queue is not None:
+            for key in keys:
+                write_queue.delete_receipt(key)
+            return
+
+        failed = storage.delete_receipts(keys)
+        if failed:
+            logger.error(
+                "Receipt GC for %s-%02d version %s left %d of %d objects: %s",
+                year, month, version, len(failed), len(keys), failed[:10],
+            )
+
+    def _report(future):
+        error = future.exception()
+        if error is not None:
+            logger.error(
+                "Receipt GC for %s-%02d version %s failed",
+                year, month, version, exc_info=error,
+            )
+
+    _gc_executor.submit(_collect).add_done_callback(_report)
 
 
 # ---------- S3 Utilities (개선: 파일명에 금액 포함) ----------
@@ -47,45 +218,40 @@ def upload_receipt_to_s3(
     year: int,
     month: int,
     amount: int,
+    version: Optional[str],
 ) -> str:
     """
     Upload receipt to S3 with amount in filename for easy recalculation.
     Filename format: {year}_{month}_{amount}_{timestamp}.jpg
+    Stored under the given version (None: legacy layout).
     """
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
     filename = f"{year}_{month:02d}_{amount}_{timestamp}.jpg"
-    key = f"receipts/{year}/{month:02d}/{filename}"
+    prefix = month_prefix(year, month)
+    key = f"{prefix}{version}/{filename}" if version else f"{prefix}{filename}"
 
-    s3_client.put_object(
-        Bucket=S3_BUCKET_NAME,
-        Key=key,
-        Body=image_bytes,
-        ContentType="image/jpeg",
-    )
+    if write_queue is not None:
+        write_queue.put_receipt(key, image_bytes, content_type="image/jpeg")
+    else:
+        storage.put_receipt(key, image_bytes, content_type="image/jpeg")
 
+    _notify_change(year, month)
     return key
 
 
 def list_receipts_from_s3(year: int, month: int) -> List[str]:
-    """List all receipt keys for a specific year/month."""
-    prefix = f"receipts/{year}/{month:02d}/"
-
-    response = s3_client.list_objects_v2(
-        Bucket=S3_BUCKET_NAME,
-        Prefix=prefix,
-    )
-
-    contents = response.get("Contents", [])
-    return [obj["Key"] for obj in contents]
+    """List all receipt keys of the active version for a specific year/month."""
+    return list_version_keys(year, month, get_active_version(year, month))
 
 
 def delete_receipt_from_s3(key: str) -> bool:
     """Delete a specific receipt from S3."""
     try:
-        s3_client.delete_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=key,
-        )
+        if write_queue is not None:
+            write_queue.delete_receipt(key)
+        else:
+            storage.delete_receipt(key)
+        _notify_key_change(key)
         return True
     except Exception as e:
         st.error(f"S3 삭제 실패: {e}")
@@ -108,13 +274,19 @@ def parse_amount_from_filename(key: str) -> Optional[int]:
     return None
 
 
-def recalculate_monthly_total(year: int, month: int) -> Tuple[int, int]:
+def recalculate_monthly_total(year: int, month: int, version: Optional[str]) -> Tuple[int, int]:
     """
-    Recalculate monthly total by reading all receipt filenames.
+    Recalculate monthly total by reading all receipt filenames of a version.
+    Returns: (total_amount, receipt_count)
+    """
+    return sum_receipt_amounts(list_version_keys(year, month, version))
+
+
+def sum_receipt_amounts(receipt_keys: List[str]) -> Tuple[int, int]:
+    """
+    Sum the amounts encoded in receipt filenames.
     Returns: (total_amount, receipt_count)
     """
-    receipt_keys = list_receipts_from_s3(year, month)
-    
     total_amount = 0
     receipt_count = 0
     
@@ -129,11 +301,12 @@ def recalculate_monthly_total(year: int, month: int) -> Tuple[int, int]:
 
 def get_receipt_bytes_from_s3(key: str) -> bytes:
     """Download receipt image bytes from S3."""
-    response = s3_client.get_object(
-        Bucket=S3_BUCKET_NAME,
-        Key=key,
-    )
-    return response["Body"].read()
+    if write_queue is not None:
+        pending = write_queue.pending_receipt_body(key)
+        if pending is not None:
+            return pending
+
+    return storage.get_receipt(key)
 
 
 # ---------- DynamoDB Utilities ----------
@@ -142,17 +315,27 @@ def save_monthly_total_to_dynamodb(
     month: int,
     total_amount: int,
     receipt_count: int,
-):
-    """Save or update monthly total in DynamoDB."""
-    receipt_table.put_item(
-        Item={
-            "year": year,
-            "month": month,
-            "total_amount": total_amount,
-            "receipt_count": receipt_count,
-            "updated_at": datetime.utcnow().isoformat() + "Z",
-        }
-    )
+    version: Optional[str],
+) -> bool:
+    """
+    Save or update monthly total in DynamoDB, keeping the active version.
+    The totals were computed from `version`; if another run activated a
+    different version meanwhile nothing is written and False is returned
+    (in write-behind mode the stale update is dropped when flushed).
+    """
+    fields = {
+        "total_amount": total_amount,
+        "receipt_count": receipt_count,
+        "updated_at": datetime.utcnow().isoformat() + "Z",
+    }
+
+    if write_queue is not None:
+        write_queue.update_total(year, month, fields, version)
+    elif not storage.update_total_if(year, month, fields, {"active_version": version}):
+        return False
+
+    _notify_change(year, month)
+    return True
 
 
 def get_monthly_total_from_dynamodb(
@@ -160,25 +343,33 @@ def get_monthly_total_from_dynamodb(
     month: int,
 ) -> Optional[dict]:
     """Get monthly total from DynamoDB."""
-    response = receipt_table.get_item(
-        Key={
-            "year": year,
-            "month": month,
-        }
-    )
+    record = storage.get_total(year, month)
+
+    if write_queue is None:
+        return record
+
+    pending = write_queue.pending_total(year, month)
+    if pending is None:
+        return record
 
-    return response.get("Item")
+    op, fields = pending
+    if op == "delete":
+        return None
+    return {**(record or {"year": year, "month": month}), **fields}
 
 
-def delete_monthly_total_from_dynamodb(year: int, month: int) -> bool:
-    """Delete monthly total from DynamoDB."""
+def delete_monthly_total_from_dynamodb(year: int, month: int, version: Optional[str]) -> bool:
+    """
+    Delete monthly total from DynamoDB, only while `version` is still the
+    active one. Returns False if it was not deleted.
+    """
     try:
-        receipt_table.delete_item(
-            Key={
-                "year": year,
-                "month": month,
-            }
-        )
+        if write_queue is not None:
+            write_queue.delete_total(year, month, version)
+        elif not storage.delete_total_if(year, month, {"active_version": version}):
+            st.error("다른 작업이 이 달의 영수증을 새로 계산하여 합계를 삭제하지 않았습니다.")
+            return False
+        _notify_change(year, month)
         return True
     except Exception as e:
         st.error(f"DynamoDB 삭제 실패: {e}")
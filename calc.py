@@ -4,12 +4,13 @@ from typing import List
 
 from aws_utils import (
     upload_receipt_to_s3,
-    save_monthly_total_to_dynamodb,
-    list_receipts_from_s3,
-    delete_receipt_from_s3,
-    delete_monthly_total_from_dynamodb,
+    get_active_version,
+    new_receipt_version,
+    activate_receipt_version,
+    delete_version_in_background,
 )
 from ocr import extract_total_from_image
+from prescreen import screen_receipt_image, screening_stats
 
 
 def render_calc_page():
@@ -18,7 +19,10 @@ def render_calc_page():
     st.caption(
         "여러 장의 영수증 이미지를 업로드하면 선택한 월의 총 합계를 계산하고 저장합니다."
     )
-    st.warning("⚠️ 해당 연월의 **기존 영수증이 모두 삭제**되고 새로 저장됩니다.")
+    st.warning(
+        "⚠️ 해당 연월의 **기존 영수증이 모두 삭제**되고 새로 저장됩니다. "
+        "(저장에 성공한 영수증이 없으면 기존 기록은 유지됩니다.)"
+    )
 
     st.divider()
 
@@ -71,54 +75,86 @@ def render_calc_page():
 
     # Process receipts
     with st.spinner("🔍 영수증을 분석하고 저장 중입니다..."):
-        # Step 1: 기존 데이터 삭제 (덮어쓰기)
-        existing_receipts = list_receipts_from_s3(year, month)
-        if existing_receipts:
-            for key in existing_receipts:
-                delete_receipt_from_s3(key)
-        delete_monthly_total_from_dynamodb(year, month)
-        
+        # Step 1: 새 버전 준비 (기존 데이터는 새 버전이 활성화된 뒤 정리)
+        previous_version = get_active_version(year, month)
+        version = new_receipt_version()
+
         # Step 2: 새 영수증 처리
         results = []
         total_amount = 0
-        
-        # Extract amounts from each receipt
-        for idx, file in enumerate(uploaded_files, 1):
-            image_bytes = file.read()
-            amount = extract_total_from_image(image_bytes)
-            
-            if amount > 0:
-                # Upload to S3 with amount in filename
-                key = upload_receipt_to_s3(
-                    image_bytes=image_bytes,
-                    year=year,
-                    month=month,
-                    amount=amount
-                )
-                results.append({
-                    'filename': file.name,
-                    'amount': amount,
-                    'key': key,
-                    'success': True
-                })
-                total_amount += amount
-            else:
-                results.append({
-                    'filename': file.name,
-                    'amount': 0,
-                    'success': False
-                })
-        
-        # Step 3: 새로운 합계 저장
+
+        try:
+            # Extract amounts from each receipt
+            for idx, file in enumerate(uploaded_files, 1):
+                image_bytes = file.read()
+
+                # 흐리거나 빈 이미지는 OCR 호출 전에 걸러냄
+                screen = screen_receipt_image(image_bytes)
+                if not screen.ok:
+                    results.append({
+                        'filename': file.name,
+                        'amount': 0,
+                        'success': False,
+                        'skipped': True,
+                        'reason': screen.summary
+                    })
+                    continue
+
+                amount = extract_total_from_image(image_bytes)
+
+                if amount > 0:
+                    # Upload to the new version prefix with amount in filename
+                    key = upload_receipt_to_s3(
+                        image_bytes=image_bytes,
+                        year=year,
+                        month=month,
+                        amount=amount,
+                        version=version
+                    )
+                    results.append({
+                        'filename': file.name,
+                        'amount': amount,
+                        'key': key,
+                        'success': True,
+                        'warning': screen.summary
+                    })
+                    total_amount += amount
+                else:
+                    results.append({
+                        'filename': file.name,
+                        'amount': 0,
+                        'success': False
+                    })
+        except Exception:
+            # Failed run: drop the partial upload, the active version is untouched
+            delete_version_in_background(year, month, version)
+            raise
+
+        # Step 3: 새로운 합계 저장 및 버전 전환
         receipt_count = len([r for r in results if r['success']])
-        
-        if receipt_count > 0:
-            save_monthly_total_to_dynamodb(
-                year=year,
-                month=month,
-                total_amount=total_amount,
-                receipt_count=receipt_count
-            )
+
+        if receipt_count == 0:
+            st.error("❌ 금액을 추출한 영수증이 없어 기존 기록을 유지합니다.")
+            for r in results:
+                st.caption(f"• {r['filename']}: {r.get('reason') or '추출 실패'}")
+            return
+
+        activated = activate_receipt_version(
+            year=year,
+            month=month,
+            version=version,
+            previous_version=previous_version,
+            total_amount=total_amount,
+            receipt_count=receipt_count
+        )
+
+        if not activated:
+            delete_version_in_background(year, month, version)
+            st.error("❌ 다른 사용자가 같은 월을 먼저 저장했습니다. 다시 시도해주세요.")
+            return
+
+        # 이전 버전의 영수증은 백그라운드에서 삭제
+        delete_version_in_background(year, month, previous_version)
 
     # Display results
     st.success("✅ 저장이 완료되었습니다!")
@@ -136,11 +172,13 @@ def render_calc_page():
     receipt_list_html = ""
     if successful:
         for r in successful:
-            receipt_list_html += f"<div style='margin-top: 0.3em;'>• {r['filename']}: <strong>{r['amount']:,}원</strong></div>"
+            warning = f" <span style='color: #e6a23c;'>⚠️ {r['warning']}</span>" if r.get('warning') else ""
+            receipt_list_html += f"<div style='margin-top: 0.3em;'>• {r['filename']}: <strong>{r['amount']:,}원</strong>{warning}</div>"
     
     if failed:
         for r in failed:
-            receipt_list_html += f"<div style='margin-top: 0.3em; color: #999;'>• {r['filename']}: <span style='color: #ff6b6b;'>추출 실패</span></div>"
+            reason = r.get('reason') or "추출 실패"
+            receipt_list_html += f"<div style='margin-top: 0.3em; color: #999;'>• {r['filename']}: <span style='color: #ff6b6b;'>{reason}</span></div>"
     
     st.markdown(
         f"""
@@ -156,3 +194,10 @@ def render_calc_page():
         """,
         unsafe_allow_html=True
     )
+
+    skipped = len([r for r in results if r.get('skipped')])
+    if skipped:
+        st.caption(
+            f"🔎 사전 검사로 OCR 호출 {skipped}회를 절약했습니다. "
+            f"(누적 {screening_stats()['rejected']}회)"
+        )
@@ -2,9 +2,7 @@ import streamlit as st
 from datetime import datetime
 
 from aws_utils import (
-    get_monthly_total_from_dynamodb,
-    list_receipts_from_s3,
-    get_receipt_bytes_from_s3,
+    get_active_version,
     parse_amount_from_filename,
     delete_receipt_from_s3,
     recalculate_monthly_total,
@@ -13,6 +11,13 @@ from aws_utils import (
     upload_receipt_to_s3,
 )
 from ocr import extract_total_from_image
+from prescreen import screen_receipt_image
+from prefetch import (
+    cached_monthly_total,
+    cached_receipt_keys,
+    cached_thumbnail,
+    prefetch_around,
+)
 
 
 def render_edit_page():
@@ -61,8 +66,10 @@ def render_edit_page():
 
         if st.button("🔍 영수증 불러오기", key="load_receipts_btn", use_container_width=True):
             with st.spinner("영수증 로딩 중..."):
-                record = get_monthly_total_from_dynamodb(year=del_year, month=del_month)
-                receipt_keys = list_receipts_from_s3(year=del_year, month=del_month)
+                prefetch_around(del_year, del_month)
+
+                record = cached_monthly_total(del_year, del_month)
+                receipt_keys = cached_receipt_keys(del_year, del_month)
                 
                 st.session_state['delete_record'] = record
                 st.session_state['delete_receipts'] = receipt_keys
@@ -74,6 +81,8 @@ def render_edit_page():
             receipt_keys = st.session_state['delete_receipts']
             stored_year = st.session_state.get('delete_year')
             stored_month = st.session_state.get('delete_month')
+            # The version the listed receipts belong to
+            stored_version = record.get('active_version') if record else None
             
             # Display current summary
             if record:
@@ -91,7 +100,7 @@ def render_edit_page():
                     amount_text = f"{amount:,}원" if amount else "금액 불명"
                     
                     # Show image
-                    image_bytes = get_receipt_bytes_from_s3(key)
+                    image_bytes = cached_thumbnail(key)
                     st.image(image_bytes, use_column_width=True)
                     
                     # Show amount
@@ -113,18 +122,22 @@ def render_edit_page():
                             
                             if success:
                                 # Recalculate total
-                                new_total, new_count = recalculate_monthly_total(stored_year, stored_month)
+                                new_total, new_count = recalculate_monthly_total(
+                                    stored_year, stored_month, stored_version
+                                )
                                 
                                 if new_count > 0:
                                     # Update DynamoDB
-                                    save_monthly_total_to_dynamodb(
-                                        stored_year, stored_month, new_total, new_count
-                                    )
-                                    st.success(f"✅ 삭제 완료! 새로운 합계: {new_total:,}원 ({new_count}장)")
+                                    if save_monthly_total_to_dynamodb(
+                                        stored_year, stored_month, new_total, new_count, stored_version
+                                    ):
+                                        st.success(f"✅ 삭제 완료! 새로운 합계: {new_total:,}원 ({new_count}장)")
+                                    else:
+                                        st.error("❌ 다른 작업이 이 달의 영수증을 새로 계산하여 합계를 갱신하지 않았습니다.")
                                 else:
                                     # Delete from DynamoDB if no receipts left
-                                    delete_monthly_total_from_dynamodb(stored_year, stored_month)
-                                    st.success("✅ 모든 영수증이 삭제되었습니다.")
+                                    if delete_monthly_total_from_dynamodb(stored_year, stored_month, stored_version):
+                                        st.success("✅ 모든 영수증이 삭제되었습니다.")
                                 
                                 # Clear session state
                                 if 'delete_receipts' in st.session_state:
@@ -182,10 +195,23 @@ def render_edit_page():
         if uploaded_files and st.button("➕ 영수증 추가", type="primary", use_container_width=True, key="add_receipts_btn"):
             with st.spinner("영수증 추가 중..."):
                 results = []
+                # Add to the version that is live now; totals are saved against it
+                version = get_active_version(add_year, add_month)
                 
                 # Process each file
                 for idx, file in enumerate(uploaded_files, 1):
                     image_bytes = file.read()
+
+                    # 흐리거나 빈 이미지는 OCR 호출 전에 걸러냄
+                    screen = screen_receipt_image(image_bytes)
+                    if not screen.ok:
+                        results.append({
+                            'filename': file.name,
+                            'success': False,
+                            'reason': screen.summary
+                        })
+                        continue
+
                     amount = extract_total_from_image(image_bytes)
                     
                     if amount > 0:
@@ -194,12 +220,14 @@ def render_edit_page():
                             image_bytes=image_bytes,
                             year=add_year,
                             month=add_month,
-                            amount=amount
+                            amount=amount,
+                            version=version,
                         )
                         results.append({
                             'filename': file.name,
                             'amount': amount,
-                            'success': True
+                            'success': True,
+                            'warning': screen.summary
                         })
                     else:
                         results.append({
@@ -208,15 +236,37 @@ def render_edit_page():
                         })
                 
                 # Recalculate total
-                new_total, new_count = recalculate_monthly_total(add_year, add_month)
+                new_total, new_count = recalculate_monthly_total(add_year, add_month, version)
                 
                 # Update DynamoDB
-                save_monthly_total_to_dynamodb(
-                    add_year, add_month, new_total, new_count
+                saved = save_monthly_total_to_dynamodb(
+                    add_year, add_month, new_total, new_count, version
                 )
                 
                 # Show summary
                 successful = [r for r in results if r['success']]
                 
-                st.success(f"✅ {len(successful)}개 영수증 추가 완료!")
-                st.info(f"📊 {add_year}년 {add_month}월 최종 합계: **{new_total:,}원** ({new_count}장)")
+                if saved:
+                    st.success(f"✅ {len(successful)}개 영수증 추가 완료!")
+                    st.info(f"📊 {add_year}년 {add_month}월 최종 합계: **{new_total:,}원** ({new_count}장)")
+                else:
+                    # The receipts went into a version that is no longer active
+                    st.error(
+                        "❌ 다른 작업이 이 달의 영수증을 새로 계산했습니다. "
+                        "추가한 영수증은 반영되지 않았으니 다시 추가해 주세요."
+                    )
+
+                rejected = [r for r in results if r.get('reason')]
+                if rejected:
+                    st.warning(
+                        "⚠️ 사전 검사에서 제외된 이미지 (OCR 호출 생략): "
+                        + ", ".join(f"{r['filename']} ({r['reason']})" for r in rejected)
+                    )
+
+                # PRESCREEN_MODE=warn: flagged images were still read by OCR
+                flagged = [r for r in successful if r.get('warning')]
+                if flagged:
+                    st.warning(
+                        "⚠️ 사전 검사 경고가 있는 이미지 (금액을 확인하세요): "
+                        + ", ".join(f"{r['filename']} ({r['warning']})" for r in flagged)
+                    )
@@ -1,11 +1,12 @@
 import streamlit as st
 from datetime import datetime
 
-from aws_utils import (
-    get_monthly_total_from_dynamodb,
-    list_receipts_from_s3,
-    get_receipt_bytes_from_s3,
-    parse_amount_from_filename,
+from aws_utils import parse_amount_from_filename
+from prefetch import (
+    cached_monthly_total,
+    cached_receipt_keys,
+    cached_thumbnail,
+    prefetch_around,
 )
 
 
@@ -57,7 +58,10 @@ def render_history_page():
         if not search_button:
             st.info("💡 연도와 월을 선택한 뒤 '기록 조회'를 눌러주세요.")
         else:
-            record = get_monthly_total_from_dynamodb(year=year, month=month)
+            # 이웃 월과 같은 연도의 나머지 월을 미리 불러오기
+            prefetch_around(year, month)
+
+            record = cached_monthly_total(year, month)
 
             if record is None:
                 st.info("ℹ️ 해당 월에 저장된 기록이 없습니다.")
@@ -84,7 +88,7 @@ def render_history_page():
 
                 st.subheader("🧾 영수증 이미지")
 
-                receipt_keys = list_receipts_from_s3(year=year, month=month)
+                receipt_keys = cached_receipt_keys(year, month)
 
                 if not receipt_keys:
                     st.info("해당 월에 저장된 영수증 이미지가 없습니다.")
@@ -96,7 +100,7 @@ def render_history_page():
                             amount = parse_amount_from_filename(key)
                             amount_text = f"{amount:,}원" if amount else "금액 불명"
                             
-                            image_bytes = get_receipt_bytes_from_s3(key)
+                            image_bytes = cached_thumbnail(key)
                             
                             st.markdown(
                                 f"<div style='margin-bottom: 1rem; text-align: center; font-size: 0.9rem; color: #666;'>"
@@ -123,7 +127,7 @@ def render_history_page():
         total_receipt_count = 0
 
         for m in range(1, 13):
-            record = get_monthly_total_from_dynamodb(year=year, month=m)
+            record = cached_monthly_total(year, m)
             if record:
                 monthly_records.append((m, record))
                 total_year_amount += record["total_amount"]
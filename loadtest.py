@@ -0,0 +1,431 @@
+"""
+Multi-session load test for the Streamlit app.
+
+Starts a real `streamlit run` server (local storage backend, stand-in
+inference client) and drives N concurrent browser-like websocket sessions
+against it, reporting per-rerun latency and the server process's RSS and
+thread count as N grows. Each level gets a fresh server.
+
+    python loadtest.py --sessions 1,2,4,8,16 --iterations 3 --ocr-latency 0.5
+
+Sessions click the page buttons with the default year/month selection, so
+concurrent calc sessions contend for the same month like real users would.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import runpy
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from types import ModuleType, SimpleNamespace
+from typing import Dict, Optional, Tuple
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAIN_SCRIPT = os.path.join(HERE, "main.py")
+CALC_UPLOADER_LABEL = "📤 영수증 이미지 업로드"
+CALC_BUTTON_LABEL = "▶️ 합계 계산 및 저장"
+WORKLOADS = ["calc", "history", "edit"]
+
+# Settings that would send harness traffic to a queue or real endpoints
+ISOLATED_ENV = ["WRITE_BEHIND", "WRITE_BEHIND_DB", "TRANSPORT_WARMUP"]
+
+
+# ---------- Stand-ins (run inside the server) ----------
+class FakeInferenceClient:
+    """Mimics InferenceClient.chat.completions.create with a fixed delay."""
+
+    def __init__(self, latency: float, amount: int = 12000):
+        self.latency = latency
+        self.amount = amount
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        time.sleep(self.latency)
+        message = SimpleNamespace(content=str(self.amount))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class FakeUploadedFile(io.BytesIO):
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+
+
+def make_receipt_image(width: int = 900, height: int = 1400) -> bytes:
+    """Noisy grayscale JPEG, roughly the size of a phone photo of a receipt."""
+    from PIL import Image
+
+    image = Image.frombytes("L", (width, height), os.urandom(width * height))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+def _stand_in_state() -> ModuleType:
+    """
+    Process-wide state for the stand-ins. Streamlit re-executes this file as
+    a fresh __main__ on every rerun, so it has to live in sys.modules.
+    """
+    state = ModuleType("_receipt_loadtest_state")
+    state.lock = threading.Lock()
+    state.installed = False
+    # setdefault is atomic, so concurrent first reruns share one state
+    return sys.modules.setdefault(state.__name__, state)
+
+
+def install_stand_ins():
+    """
+    Swap in the fake inference client, and make the calc uploader return
+    synthetic files (a scripted client cannot upload through the widget).
+    Runs once per server process.
+    """
+    state = _stand_in_state()
+    with state.lock:
+        if state.installed:
+            return
+
+        import streamlit as st
+        import ocr
+
+        ocr.client = FakeInferenceClient(float(os.environ["LOADTEST_OCR_LATENCY"]))
+
+        image_bytes = make_receipt_image()
+        count = int(os.environ["LOADTEST_RECEIPTS"])
+        real_file_uploader = st.file_uploader
+
+        def file_uploader(label, *args, **kwargs):
+            value = real_file_uploader(label, *args, **kwargs)
+            if value or label != CALC_UPLOADER_LABEL:
+                return value
+            return [FakeUploadedFile(image_bytes, f"receipt_{i}.jpg") for i in range(count)]
+
+        st.file_uploader = file_uploader
+        state.installed = True
+
+
+def serve():
+    """Script body executed by `streamlit run loadtest.py -- serve`."""
+    install_stand_ins()
+    runpy.run_path(MAIN_SCRIPT, run_name="__main__")
+
+
+def seed_months(year: int, receipts: int):
+    """Give every month of the year an active version to browse."""
+    from aws_utils import (
+        activate_receipt_version,
+        get_active_version,
+        new_receipt_version,
+        upload_receipt_to_s3,
+    )
+
+    image_bytes = make_receipt_image()
+    for month in range(1, 13):
+        version = new_receipt_version()
+        for _ in range(receipts):
+            upload_receipt_to_s3(image_bytes, year, month, 12000, version=version)
+        activate_receipt_version(
+            year, month, version,
+            previous_version=get_active_version(year, month),
+            total_amount=12000 * receipts,
+            receipt_count=receipts,
+        )
+
+
+# ---------- Server Process ----------
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env: Dict[str, str], timeout: float = 60) -> Tuple[subprocess.Popen, int]:
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", os.path.abspath(__file__),
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--server.address", "127.0.0.1",
+            "--server.fileWatcherType", "none",
+            "--server.enableXsrfProtection", "false",
+            "--browser.gatherUsageStats", "false",
+            "--", "serve",
+        ],
+        cwd=HERE,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return process, port
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+
+    process.kill()
+    raise RuntimeError("Streamlit 서버를 시작하지 못했습니다.")
+
+
+def read_proc_status(pid: int) -> Tuple[float, int]:
+    """Return (RSS in MB, thread count) of a process from /proc."""
+    rss_mb, threads = 0.0, 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_mb = int(line.split()[1]) / 1024
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return rss_mb, threads
+
+
+# ---------- Websocket Sessions ----------
+class Session:
+    """Minimal Streamlit browser client: sends reruns, waits for script_finished."""
+
+    def __init__(self, port: int, timeout: float):
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.timeout = timeout
+        self.buttons: Dict[str, str] = {}  # label and user key -> widget id
+        self.connection = None
+
+    async def connect(self):
+        # Streamlit serves websockets via starlette/websockets in current
+        # releases and via tornado in older ones
+        try:
+            from websockets.asyncio.client import connect
+        except ImportError:
+            from tornado.websocket import websocket_connect
+
+            connection = await websocket_connect(self.url, subprotocols=["streamlit"])
+            self._send = lambda data: connection.write_message(data, binary=True)
+            self._receive = connection.read_message
+            self._close = connection.close
+        else:
+            from websockets.exceptions import ConnectionClosed
+
+            connection = await connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+            async def receive():
+                try:
+                    return await connection.recv()
+                except ConnectionClosed:
+                    return None
+
+            self._send = connection.send
+            self._receive = receive
+            self._close = connection.close
+        self.connection = connection
+
+    async def rerun(self, trigger_id: Optional[str] = None) -> bool:
+        """Run the script once; returns False if the page raised an exception."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ""
+        if trigger_id:
+            back_msg.rerun_script.widget_states.widgets.add(id=trigger_id, trigger_value=True)
+        await self._send(back_msg.SerializeToString())
+
+        return await asyncio.wait_for(self._read_until_finished(), self.timeout)
+
+    async def _read_until_finished(self) -> bool:
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        ok = True
+        while True:
+            data = await self._receive()
+            if data is None:
+                raise ConnectionError("서버 연결이 끊어졌습니다.")
+
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof("type")
+
+            if kind == "script_finished":
+                return ok
+            if kind != "delta" or msg.delta.WhichOneof("type") != "new_element":
+                continue
+
+            element = msg.delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type == "exception":
+                ok = False
+            elif element_type == "button":
+                self.buttons[element.button.label] = element.button.id
+                # Generated ids end with the user key: "$$ID-<hash>-<key>"
+                self.buttons[element.button.id.rsplit("-", 1)[-1]] = element.button.id
+
+    async def close(self):
+        if self.connection is not None:
+            result = self._close()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+WORKLOAD_BUTTONS = {
+    "calc": CALC_BUTTON_LABEL,
+    "history": "monthly_search_btn",
+    "edit": "load_receipts_btn",
+}
+
+
+async def run_session(port: int, index: int, iterations: int, timeout: float) -> Dict:
+    workload = WORKLOADS[index % len(WORKLOADS)]
+    session = Session(port, timeout)
+    latencies = []
+    errors = 0
+
+    try:
+        start = time.perf_counter()
+        await session.connect()
+        if not await session.rerun():
+            errors += 1
+        initial_load = time.perf_counter() - start
+
+        for _ in range(iterations):
+            start = time.perf_counter()
+            try:
+                if not await session.rerun(session.buttons.get(WORKLOAD_BUTTONS[workload])):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+    except Exception:
+        errors += 1
+        initial_load = None
+    finally:
+        await session.close()
+
+    return {
+        "session": index,
+        "workload": workload,
+        "initial_load": initial_load,
+        "latencies": latencies,
+        "errors": errors,
+    }
+
+
+async def _sample_server(pid: int, peaks: Dict[str, float], stop: asyncio.Event):
+    while not stop.is_set():
+        try:
+            rss_mb, threads = read_proc_status(pid)
+        except OSError:
+            return
+        peaks["rss_mb"] = max(peaks["rss_mb"], rss_mb)
+        peaks["threads"] = max(peaks["threads"], threads)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _run_sessions(pid: int, port: int, sessions: int, iterations: int, timeout: float):
+    peaks = {"rss_mb": 0.0, "threads": 0}
+    stop = asyncio.Event()
+    sampler = asyncio.ensure_future(_sample_server(pid, peaks, stop))
+
+    results = await asyncio.gather(*(
+        run_session(port, i, iterations, timeout) for i in range(sessions)
+    ))
+
+    stop.set()
+    await sampler
+    return results, peaks
+
+
+def run_level(env: Dict[str, str], sessions: int, iterations: int, timeout: float) -> Dict:
+    process, port = start_server(env)
+    try:
+        idle_rss_mb, idle_threads = read_proc_status(process.pid)
+        start = time.perf_counter()
+        results, peaks = asyncio.run(_run_sessions(process.pid, port, sessions, iterations, timeout))
+        elapsed = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    latencies = sorted(l for r in results for l in r["latencies"])
+    return {
+        "sessions": sessions,
+        "elapsed": elapsed,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+        "max": latencies[-1] if latencies else 0.0,
+        "errors": sum(r["errors"] for r in results),
+        "idle_rss_mb": idle_rss_mb,
+        "idle_threads": idle_threads,
+        "peak_rss_mb": peaks["rss_mb"],
+        "peak_threads": peaks["threads"],
+        "per_session": results,
+    }
+
+
+# ---------- Entry Point ----------
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent session load test")
+    parser.add_argument("--sessions", default="1,2,4,8,16", help="comma-separated session counts")
+    parser.add_argument("--iterations", type=int, default=3, help="reruns per session")
+    parser.add_argument("--receipts", type=int, default=3, help="receipts per upload/month")
+    parser.add_argument("--ocr-latency", type=float, default=0.5, help="stand-in OCR delay (s)")
+    parser.add_argument("--timeout", type=float, default=120, help="per-rerun timeout (s)")
+    parser.add_argument("--json", help="write the full report to this path")
+    args = parser.parse_args()
+
+    # Harness and server share a fresh local store, never an existing one
+    os.environ["STORAGE_BACKEND"] = "local"
+    os.environ["LOCAL_STORAGE_DIR"] = tempfile.mkdtemp(prefix="receipt_loadtest_")
+    os.environ.setdefault("HF_TOKEN", "loadtest")
+    for name in ISOLATED_ENV:
+        os.environ.pop(name, None)
+    env = dict(
+        os.environ,
+        LOADTEST_OCR_LATENCY=str(args.ocr_latency),
+        LOADTEST_RECEIPTS=str(args.receipts),
+    )
+
+    # Seed the year the pages select by default (the previous month's year)
+    today = datetime.today()
+    seed_months(today.year - 1 if today.month == 1 else today.year, args.receipts)
+
+    print(f"storage: {os.environ['LOCAL_STORAGE_DIR']}")
+    print(
+        f"{'N':>4} {'p50(s)':>8} {'p95(s)':>8} {'max(s)':>8} {'errors':>7} "
+        f"{'RSS(MB)':>8} {'peak':>8} {'threads':>8} {'peak':>6}"
+    )
+
+    report = []
+    for sessions in [int(n) for n in args.sessions.split(",")]:
+        level = run_level(env, sessions, args.iterations, args.timeout)
+        report.append(level)
+        print(
+            f"{sessions:>4} {level['p50']:>8.2f} {level['p95']:>8.2f} {level['max']:>8.2f} "
+            f"{level['errors']:>7} {level['idle_rss_mb']:>8.1f} {level['peak_rss_mb']:>8.1f} "
+            f"{level['idle_threads']:>8} {level['peak_threads']:>6}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    # `streamlit run` executes this file with "serve" as the script argument
+    if sys.argv[1:2] == ["serve"]:
+        serve()
+    else:
+        main()
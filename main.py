@@ -1,8 +1,11 @@
 import streamlit as st
 
-from calc import render_calc_page
-from history import render_history_page
-from edit import render_edit_page
+from profiler import (
+    start_run_profile,
+    finish_run_profile,
+    profiling_enabled,
+    render_profile_downloads,
+)
 
 
 # ---------- Page Config ----------
@@ -45,14 +48,35 @@ st.title("🧾 월별 영수증 관리")
 st.caption("영수증을 업로드하여 월별 합계를 계산하고, 과거 기록을 조회하며, 수정/삭제할 수 있습니다.")
 st.divider()
 
-# ---------- Tabs ----------
-tabs = st.tabs(["🧮 계산하기", "📊 기록 보기", "✏️ 수정/삭제"])
+# ---------- Profiling (RECEIPT_PROFILE=1 또는 ?profile=1) ----------
+run_profile = start_run_profile()
+
+# The sampler must stop even if an import calls st.stop() (e.g. missing env vars)
+try:
+    with run_profile.section("import"):
+        from calc import render_calc_page
+        from history import render_history_page
+        from edit import render_edit_page
+        from aws_utils import write_queue
+        from write_behind import render_sync_status
+        from transport import render_connection_stats
+
+    # ---------- Tabs ----------
+    tabs = st.tabs(["🧮 계산하기", "📊 기록 보기", "✏️ 수정/삭제"])
+
+    with tabs[0], run_profile.section("render_calc_page"):
+        render_calc_page()
+
+    with tabs[1], run_profile.section("render_history_page"):
+        render_history_page()
 
-with tabs[0]:
-    render_calc_page()
+    with tabs[2], run_profile.section("render_edit_page"):
+        render_edit_page()
+finally:
+    finish_run_profile(run_profile)
 
-with tabs[1]:
-    render_history_page()
+render_sync_status(write_queue)
+render_profile_downloads()
 
-with tabs[2]:
-    render_edit_page()
+if profiling_enabled():
+    render_connection_stats()
@@ -3,7 +3,14 @@ import re
 import base64
 
 import streamlit as st
-from huggingface_hub import InferenceClient
+from huggingface_hub import InferenceClient, get_session
+
+from transport import (
+    HTTP_READ_TIMEOUT,
+    TRANSPORT_WARMUP,
+    configure_hf_http_backend,
+    start_warm_up,
+)
 
 
 # ---------- Environment Validation ----------
@@ -13,11 +20,20 @@ if not os.environ.get("HF_TOKEN"):
 
 
 # ---------- Hugging Face Client ----------
+HF_BASE_URL = "https://router.huggingface.co"
+
+configure_hf_http_backend()
+
 client = InferenceClient(
     api_key=os.environ["HF_TOKEN"],
-    base_url="https://router.huggingface.co",
+    base_url=HF_BASE_URL,
+    timeout=HTTP_READ_TIMEOUT,
 )
 
+if TRANSPORT_WARMUP:
+    # get_session() is the pooled client the InferenceClient sends through
+    start_warm_up(lambda: get_session().head(HF_BASE_URL, timeout=HTTP_READ_TIMEOUT))
+
 
 # ---------- OCR Logic ----------
 def extract_total_from_image(image_bytes: bytes) -> int:
@@ -0,0 +1,174 @@
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from aws_utils import (
+    add_change_listener,
+    get_monthly_total_from_dynamodb,
+    get_receipt_bytes_from_s3,
+    list_receipts_from_s3,
+)
+
+
+# ---------- Settings ----------
+PREFETCH_CACHE_MB = float(os.environ.get("PREFETCH_CACHE_MB", "128"))
+PREFETCH_TTL = float(os.environ.get("PREFETCH_TTL", "300"))
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "4"))
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "800"))
+
+
+# ---------- Bounded Cache ----------
+class BoundedCache:
+    """
+    Thread-safe LRU cache shared by all sessions, bounded by approximate size
+    in bytes. Entries expire after ttl seconds so changes made by other
+    processes show up eventually.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Tuple[Any, int, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Per-key counters bumped on invalidation so loads that raced with it
+        # are dropped; only invalidated keys get an entry
+        self._generations: Dict[tuple, int] = {}
+
+    @staticmethod
+    def _weight(value: Any) -> int:
+        if isinstance(value, bytes):
+            return len(value)
+        if isinstance(value, list):
+            return 100 * len(value) + 100
+        return 1024
+
+    def generation(self, key: tuple) -> int:
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def get(self, key: tuple) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, weight, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._size -= weight
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: tuple, value: Any, generation: Optional[int] = None):
+        weight = self._weight(value)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, 0):
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (value, weight, time.monotonic())
+            self._size += weight
+
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_weight, _) = self._entries.popitem(last=False)
+                self._size -= evicted_weight
+
+    def invalidate(self, keys: List[tuple]):
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._size -= entry[1]
+
+
+cache = BoundedCache(max_bytes=int(PREFETCH_CACHE_MB * 1024 * 1024), ttl=PREFETCH_TTL)
+
+
+def _cached(key: tuple, load: Callable[[], Any]) -> Any:
+    hit, value = cache.get(key)
+    if hit:
+        return value
+    generation = cache.generation(key)
+    value = load()
+    cache.set(key, value, generation=generation)
+    return value
+
+
+def _invalidate_month(year: int, month: int):
+    cache.invalidate([("total", year, month), ("keys", year, month)])
+
+
+add_change_listener(_invalidate_month)
+
+
+# ---------- Cached Reads ----------
+def cached_monthly_total(year: int, month: int) -> Optional[dict]:
+    return _cached(("total", year, month), lambda: get_monthly_total_from_dynamodb(year, month))
+
+
+def cached_receipt_keys(year: int, month: int) -> List[str]:
+    return _cached(("keys", year, month), lambda: list_receipts_from_s3(year, month))
+
+
+def make_thumbnail(image_bytes: bytes) -> bytes:
+    """Downscale a receipt image for gallery display."""
+    try:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+        image = image.convert("RGB")
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue()
+    except Exception:
+        return image_bytes
+
+
+def cached_thumbnail(key: str) -> bytes:
+    # Receipt keys are never rewritten, so thumbnails need no invalidation
+    return _cached(("thumb", key), lambda: make_thumbnail(get_receipt_bytes_from_s3(key)))
+
+
+# ---------- Prefetching ----------
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def _warm_month(year: int, month: int):
+    try:
+        cached_monthly_total(year, month)
+        for key in cached_receipt_keys(year, month):
+            cached_thumbnail(key)
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard((year, month))
+
+
+def _shift_month(year: int, month: int, delta: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + delta
+    return index // 12, index % 12 + 1
+
+
+def prefetch_around(year: int, month: int):
+    """
+    Warm the cache in the background for the months next to the one being
+    viewed, then for the rest of its year.
+    """
+    neighbours = [_shift_month(year, month, -1), _shift_month(year, month, 1)]
+    rest_of_year = [(year, m) for m in range(1, 13) if (year, m) not in neighbours and m != month]
+
+    for target in neighbours + rest_of_year:
+        with _in_flight_lock:
+            if target in _in_flight:
+                continue
+            _in_flight.add(target)
+        _executor.submit(_warm_month, *target)
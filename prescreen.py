@@ -0,0 +1,105 @@
+import io
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+from PIL import Image, ImageOps
+
+
+# ---------- Settings ----------
+# PRESCREEN_MODE: "reject" (skip OCR), "warn" (OCR anyway, flag the image) or "off"
+PRESCREEN_MODE = os.environ.get("PRESCREEN_MODE", "reject").lower()
+PRESCREEN_MIN_SHARPNESS = float(os.environ.get("PRESCREEN_MIN_SHARPNESS", "60"))
+PRESCREEN_MIN_CONTRAST = float(os.environ.get("PRESCREEN_MIN_CONTRAST", "40"))
+PRESCREEN_MIN_TEXT_DENSITY = float(os.environ.get("PRESCREEN_MIN_TEXT_DENSITY", "0.005"))
+PRESCREEN_EDGE_THRESHOLD = float(os.environ.get("PRESCREEN_EDGE_THRESHOLD", "20"))
+PRESCREEN_MAX_SIDE = int(os.environ.get("PRESCREEN_MAX_SIDE", "512"))
+
+
+@dataclass
+class ScreenResult:
+    ok: bool
+    reasons: List[str] = field(default_factory=list)
+    sharpness: float = 0.0     # variance of the Laplacian
+    contrast: float = 0.0      # spread between 1st and 99th percentile gray levels
+    text_density: float = 0.0  # fraction of strong-edge pixels
+
+    @property
+    def summary(self) -> str:
+        return ", ".join(self.reasons)
+
+
+# ---------- Statistics ----------
+_stats = {"screened": 0, "rejected": 0, "warned": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def screening_stats() -> dict:
+    """Counts since process start; "rejected" is the number of OCR calls saved."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+# ---------- Screening ----------
+def _measure(image_bytes: bytes):
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    image = image.convert("L")
+    image.thumbnail((PRESCREEN_MAX_SIDE, PRESCREEN_MAX_SIDE))
+    gray = np.asarray(image, dtype=np.float32)
+
+    # 4-neighbour Laplacian on the interior pixels
+    laplacian = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+        - 4 * gray[1:-1, 1:-1]
+    )
+
+    sharpness = float(laplacian.var()) if laplacian.size else 0.0
+    # Percentile spread, so sparse dark text on white paper still counts
+    low, high = np.percentile(gray, [1, 99])
+    contrast = float(high - low)
+    text_density = float((np.abs(laplacian) > PRESCREEN_EDGE_THRESHOLD).mean()) if laplacian.size else 0.0
+    return sharpness, contrast, text_density
+
+
+def screen_receipt_image(image_bytes: bytes) -> ScreenResult:
+    """
+    Cheap local check for blank, blurry or non-receipt images.
+    In "reject" mode ok=False means the OCR call should be skipped.
+    """
+    if PRESCREEN_MODE == "off":
+        return ScreenResult(ok=True)
+
+    _count("screened")
+
+    try:
+        sharpness, contrast, text_density = _measure(image_bytes)
+    except Exception:
+        _count("rejected")
+        return ScreenResult(ok=False, reasons=["이미지를 읽을 수 없음"])
+
+    reasons = []
+    if contrast < PRESCREEN_MIN_CONTRAST:
+        reasons.append("대비가 너무 낮음")
+    if sharpness < PRESCREEN_MIN_SHARPNESS:
+        reasons.append("이미지가 흐림")
+    if text_density < PRESCREEN_MIN_TEXT_DENSITY:
+        reasons.append("글자가 거의 없음")
+
+    ok = not reasons or PRESCREEN_MODE == "warn"
+    if reasons:
+        _count("rejected" if not ok else "warned")
+
+    return ScreenResult(
+        ok=ok,
+        reasons=reasons,
+        sharpness=sharpness,
+        contrast=contrast,
+        text_density=text_density,
+    )
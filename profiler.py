@@ -0,0 +1,187 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import streamlit as st
+
+
+# ---------- Settings ----------
+# Enable with RECEIPT_PROFILE=1 or the ?profile=1 query parameter
+PROFILE_ENV_VAR = "RECEIPT_PROFILE"
+PROFILE_QUERY_PARAM = "profile"
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_HISTORY = int(os.environ.get("PROFILE_HISTORY", "5"))
+
+SESSION_KEY = "_run_profiles"
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+# ---------- Sampling Profiler ----------
+class RunProfile:
+    """
+    Samples the script thread's stack at a fixed interval for one rerun and
+    records wall time per named section (e.g. each render_*_page).
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.thread_id = threading.get_ident()
+        self.started_at = datetime.now()
+        self.samples: Counter = Counter()
+        self.sections: List[Tuple[str, float]] = []
+        self.duration = 0.0
+
+        self._start = time.perf_counter()
+        self._stop_event = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample_loop,
+            name="run-profiler",
+            daemon=True,
+        )
+        self._sampler.start()
+
+    def _sample_loop(self):
+        own_file = __file__
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code.co_filename != own_file:
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.samples[tuple(reversed(stack))] += 1
+
+    @contextmanager
+    def section(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append((name, time.perf_counter() - start))
+
+    def stop(self):
+        self._stop_event.set()
+        self._sampler.join()
+        self.duration = time.perf_counter() - self._start
+
+    # ----- Exporters -----
+    def to_folded(self) -> str:
+        """Collapsed stacks, readable by flamegraph.pl and speedscope."""
+        lines = []
+        for stack, count in self.samples.items():
+            names = ";".join(f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack)
+            lines.append(f"{names} {count}")
+        return "\n".join(lines) + "\n"
+
+    def to_speedscope(self) -> str:
+        """Sampled profile in the speedscope file format."""
+        frame_index: Dict[Frame, int] = {}
+        frames = []
+        samples = []
+        weights = []
+        interval_ms = self.interval * 1000
+
+        for stack, count in self.samples.items():
+            indices = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    name, path, line = frame
+                    frames.append({"name": name, "file": path, "line": line})
+                indices.append(frame_index[frame])
+            samples.append(indices)
+            weights.append(count * interval_ms)
+
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.label,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+            "name": self.label,
+            "exporter": "receipt-calculator profiler",
+        })
+
+    @property
+    def label(self) -> str:
+        return f"rerun {self.started_at.strftime('%H:%M:%S')}"
+
+
+class _DisabledProfile:
+    """Stand-in used when profiling is off; sections cost nothing."""
+
+    def section(self, name: str):
+        return nullcontext()
+
+
+# ---------- Run Lifecycle ----------
+def profiling_enabled() -> bool:
+    if os.environ.get(PROFILE_ENV_VAR, "").lower() in ("1", "true", "yes"):
+        return True
+    return st.query_params.get(PROFILE_QUERY_PARAM) == "1"
+
+
+def start_run_profile():
+    """Start profiling the current script run if the debug toggle is on."""
+    if not profiling_enabled():
+        return _DisabledProfile()
+    return RunProfile()
+
+
+def finish_run_profile(run):
+    """Stop the profiler and keep the last PROFILE_HISTORY profiles per session."""
+    if not isinstance(run, RunProfile):
+        return
+
+    run.stop()
+    profiles = st.session_state.setdefault(SESSION_KEY, deque(maxlen=PROFILE_HISTORY))
+    profiles.append(run)
+
+
+def render_profile_downloads():
+    """Sidebar listing recent rerun profiles with flame graph downloads."""
+    profiles: Optional[deque] = st.session_state.get(SESSION_KEY)
+    if not profiles:
+        return
+
+    with st.sidebar.expander("🔬 실행 프로파일", expanded=False):
+        for idx, run in enumerate(reversed(profiles)):
+            sections = " · ".join(f"{name} {seconds * 1000:,.0f}ms" for name, seconds in run.sections)
+            st.markdown(f"**{run.label}** — {run.duration * 1000:,.0f}ms")
+            st.caption(sections or "섹션 없음")
+
+            stamp = run.started_at.strftime("%Y%m%d_%H%M%S")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    "speedscope",
+                    data=run.to_speedscope(),
+                    file_name=f"profile_{stamp}.speedscope.json",
+                    mime="application/json",
+                    key=f"profile_speedscope_{idx}_{stamp}",
+                )
+            with col2:
+                st.download_button(
+                    "flame graph",
+                    data=run.to_folded(),
+                    file_name=f"profile_{stamp}.folded.txt",
+                    mime="text/plain",
+                    key=f"profile_folded_{idx}_{stamp}",
+                )
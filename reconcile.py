@@ -0,0 +1,184 @@
+"""
+Consistency check between stored receipts and monthly totals.
+
+Lists every receipts/{year}/{month}/ prefix in parallel, recomputes the
+totals from the filenames and diffs them against the totals table.
+
+    python reconcile.py                  # dry run: report mismatches only
+    python reconcile.py --repair         # fix mismatches with batched conditional writes
+    python reconcile.py --repair --interval 3600   # run every hour
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from aws_utils import (
+    filter_version_keys,
+    month_prefix,
+    storage,
+    sum_receipt_amounts,
+    write_queue,
+)
+
+
+@dataclass
+class Mismatch:
+    year: int
+    month: int
+    stored: Optional[Tuple[int, int]]  # (total_amount, receipt_count) in the table
+    actual: Tuple[int, int]            # recomputed from receipt filenames
+    version: Optional[str] = None      # active_version seen by the scan
+
+    @property
+    def expected(self) -> Optional[dict]:
+        """Stored values the repair write is conditional on (None: no record)."""
+        if self.stored is None:
+            return None
+        return {
+            "active_version": self.version,
+            "total_amount": self.stored[0],
+            "receipt_count": self.stored[1],
+        }
+
+    def describe(self) -> str:
+        stored = "없음" if self.stored is None else f"{self.stored[0]:,}원 ({self.stored[1]}장)"
+        actual = f"{self.actual[0]:,}원 ({self.actual[1]}장)"
+        return f"{self.year}년 {self.month:2d}월: 저장값 {stored} → 실제 {actual}"
+
+
+# ---------- Discovery ----------
+def _numeric_children(prefix: str) -> List[int]:
+    children = []
+    for child in storage.list_prefixes(prefix):
+        name = child[len(prefix):].strip("/")
+        if name.isdigit():
+            children.append(int(name))
+    return children
+
+
+def discover_months(executor: ThreadPoolExecutor) -> List[Tuple[int, int]]:
+    """Find every (year, month) that has a receipts/{year}/{month}/ prefix."""
+    years = _numeric_children("receipts/")
+    month_lists = executor.map(lambda y: _numeric_children(f"receipts/{y}/"), years)
+    return [(year, month) for year, months in zip(years, month_lists) for month in months]
+
+
+# ---------- Reconciliation ----------
+def find_mismatches(workers: int) -> List[Mismatch]:
+    """
+    Recompute every month's total from its active receipts and compare with
+    the stored record.
+    """
+    records = {
+        (int(item["year"]), int(item["month"])): item
+        for item in storage.scan_totals()
+    }
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        months = sorted(set(discover_months(executor)) | set(records))
+        listings = executor.map(
+            lambda ym: storage.list_receipts(month_prefix(*ym)),
+            months,
+        )
+
+        mismatches = []
+        for (year, month), keys in zip(months, listings):
+            record = records.get((year, month))
+            version = record.get("active_version") if record else None
+            actual = sum_receipt_amounts(filter_version_keys(keys, year, month, version))
+
+            stored = None
+            if record is not None:
+                stored = (int(record["total_amount"]), int(record["receipt_count"]))
+
+            # A month without receipts should have no record at all
+            if stored == actual or (stored is None and actual[1] == 0):
+                continue
+            mismatches.append(Mismatch(year, month, stored, actual, version))
+
+    return mismatches
+
+
+def _has_pending_writes(m: Mismatch) -> bool:
+    """Write-behind changes not yet flushed make the scan look inconsistent."""
+    if write_queue is None:
+        return False
+    puts, deletes = write_queue.pending_receipts(month_prefix(m.year, m.month))
+    return bool(puts or deletes) or write_queue.pending_total(m.year, m.month) is not None
+
+
+def repair(mismatches: List[Mismatch]) -> List[Mismatch]:
+    """
+    Write the recomputed totals back in one batch of conditional writes,
+    each applied only if the record still matches the scan. Months changed
+    since the scan (e.g. a new version was activated) or with unflushed
+    writes are skipped and returned.
+    """
+    updated_at = datetime.utcnow().isoformat() + "Z"
+    skipped = [m for m in mismatches if _has_pending_writes(m)]
+    pending = [m for m in mismatches if m not in skipped]
+
+    writes = []
+    for m in pending:
+        fields = None  # a month without receipts loses its record
+        if m.actual[1] > 0:
+            fields = {
+                "total_amount": m.actual[0],
+                "receipt_count": m.actual[1],
+                "updated_at": updated_at,
+            }
+        writes.append((m.year, m.month, fields, m.expected))
+
+    applied = storage.write_totals_if(writes) if writes else []
+    skipped.extend(m for m, ok in zip(pending, applied) if not ok)
+    return skipped
+
+
+def run_once(apply: bool, workers: int) -> List[Mismatch]:
+    start = time.perf_counter()
+    mismatches = find_mismatches(workers)
+
+    for m in mismatches:
+        print(m.describe())
+
+    skipped = []
+    if apply and mismatches:
+        skipped = repair(mismatches)
+        for m in skipped:
+            print(f"{m.year}년 {m.month:2d}월: 점검 중 변경되어 건너뜀")
+
+    mode = "수정" if apply else "확인(dry-run)"
+    elapsed = time.perf_counter() - start
+    summary = f"불일치 {len(mismatches)}건"
+    if skipped:
+        summary += f", 건너뜀 {len(skipped)}건"
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {mode}: {summary} ({elapsed:.2f}s)")
+    return mismatches
+
+
+# ---------- Entry Point ----------
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile receipts with monthly totals")
+    parser.add_argument("--repair", action="store_true", help="write fixes (default: dry run)")
+    parser.add_argument("--interval", type=float, help="repeat every N seconds")
+    parser.add_argument("--workers", type=int, default=16, help="parallel listing threads")
+    args = parser.parse_args()
+
+    if not args.interval:
+        run_once(apply=args.repair, workers=args.workers)
+        return
+
+    while True:
+        try:
+            run_once(apply=args.repair, workers=args.workers)
+        except Exception as e:
+            # Keep the schedule alive through transient backend errors
+            print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] 실패: {e}")
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
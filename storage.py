@@ -0,0 +1,538 @@
+import json
+import mmap
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+
+# (year, month, fields to set or None to delete, expected attribute values)
+TotalWrite = Tuple[int, int, Optional[dict], Optional[dict]]
+
+# ---------- Storage Interface ----------
+class ReceiptStorage(ABC):
+    """
+    Storage backend for receipt image blobs and monthly totals.
+    Keys use the S3 layout: receipts/{year}/{month}/{filename}
+    """
+
+    def warm_up(self):
+        """Open connections ahead of the first real request (optional)."""
+
+    @abstractmethod
+    def put_receipt(self, key: str, data: bytes, content_type: str = "image/jpeg"):
+        ...
+
+    @abstractmethod
+    def get_receipt(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    def list_receipts(self, prefix: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def list_prefixes(self, prefix: str) -> List[str]:
+        """List the immediate "sub-directories" below prefix (ending in "/")."""
+
+    @abstractmethod
+    def delete_receipt(self, key: str):
+        ...
+
+    def delete_receipts(self, keys: List[str]) -> List[str]:
+        """Delete several receipts. Returns the keys that could not be deleted."""
+        failed = []
+        for key in keys:
+            try:
+                self.delete_receipt(key)
+            except Exception:
+                failed.append(key)
+        return failed
+
+    @abstractmethod
+    def get_total(self, year: int, month: int) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def put_total(self, item: dict):
+        ...
+
+    @abstractmethod
+    def put_total_if_version(self, item: dict, expected_version: Optional[str]) -> bool:
+        """
+        Put the item only if the stored active_version equals expected_version
+        (None: no active_version yet). Returns False if the condition fails.
+        """
+
+    @abstractmethod
+    def update_total(self, year: int, month: int, fields: dict):
+        """Set the given attributes, keeping any others (e.g. active_version)."""
+
+    @abstractmethod
+    def update_total_if(
+        self, year: int, month: int, fields: dict, expected: Optional[dict]
+    ) -> bool:
+        """
+        Set the given attributes only if the stored item still holds the
+        attribute values in expected (a None value: attribute absent, which a
+        missing item satisfies; expected None: no item yet). Returns False if
+        the condition fails.
+        """
+
+    @abstractmethod
+    def delete_total(self, year: int, month: int):
+        ...
+
+    @abstractmethod
+    def delete_total_if(self, year: int, month: int, expected: dict) -> bool:
+        """Delete the item only if it still holds the values in expected."""
+
+    @abstractmethod
+    def scan_totals(self) -> List[dict]:
+        """Return every monthly total item."""
+
+    def write_totals_if(self, writes: List[TotalWrite]) -> List[bool]:
+        """
+        Batched conditional writes of several months. Each write is
+        (year, month, fields, expected) with the semantics of update_total_if,
+        or of delete_total_if when fields is None. Returns whether each
+        write was applied.
+        """
+        return [
+            self.delete_total_if(year, month, expected) if fields is None
+            else self.update_total_if(year, month, fields, expected)
+            for year, month, fields, expected in writes
+        ]
+
+
+# ---------- AWS (S3 + DynamoDB) ----------
+class AWSStorage(ReceiptStorage):
+    """Receipts in S3, monthly totals in DynamoDB."""
+
+    def __init__(self, region: str, bucket_name: str, table_name: str, config=None):
+        import boto3
+
+        self.bucket_name = bucket_name
+        self.s3_client = boto3.client("s3", region_name=region, config=config)
+        self.dynamodb = boto3.resource("dynamodb", region_name=region, config=config)
+        self.table = self.dynamodb.Table(table_name)
+
+    def warm_up(self):
+        # Cheap calls that resolve DNS and complete the TLS handshake
+        self.s3_client.head_bucket(Bucket=self.bucket_name)
+        self.table.get_item(Key={"year": 0, "month": 0})
+
+    def put_receipt(self, key: str, data: bytes, content_type: str = "image/jpeg"):
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=data,
+            ContentType=content_type,
+        )
+
+    def get_receipt(self, key: str) -> bytes:
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name,
+            Key=key,
+        )
+        return response["Body"].read()
+
+    def list_receipts(self, prefix: str) -> List[str]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            keys.extend(obj["Key"] for obj in page.get("Contents", []))
+        return keys
+
+    def list_prefixes(self, prefix: str) -> List[str]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        prefixes = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter="/"):
+            prefixes.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+        return prefixes
+
+    def delete_receipt(self, key: str):
+        self.s3_client.delete_object(
+            Bucket=self.bucket_name,
+            Key=key,
+        )
+
+    def delete_receipts(self, keys: List[str]) -> List[str]:
+        failed = []
+        # DeleteObjects accepts at most 1000 keys per request
+        for start in range(0, len(keys), 1000):
+            chunk = keys[start:start + 1000]
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={
+                    "Objects": [{"Key": key} for key in chunk],
+                    "Quiet": True,
+                },
+            )
+            # Quiet mode reports only the per-key failures, without raising
+            failed.extend(error["Key"] for error in response.get("Errors", []))
+        return failed
+
+    def get_total(self, year: int, month: int) -> Optional[dict]:
+        response = self.table.get_item(
+            Key={
+                "year": year,
+                "month": month,
+            }
+        )
+        return response.get("Item")
+
+    def put_total(self, item: dict):
+        self.table.put_item(Item=item)
+
+    def put_total_if_version(self, item: dict, expected_version: Optional[str]) -> bool:
+        from boto3.dynamodb.conditions import Attr
+        from botocore.exceptions import ClientError
+
+        if expected_version is None:
+            condition = Attr("active_version").not_exists()
+        else:
+            condition = Attr("active_version").eq(expected_version)
+
+        try:
+            self.table.put_item(Item=item, ConditionExpression=condition)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+    @staticmethod
+    def _update_expression(fields: dict) -> Tuple[str, dict, dict]:
+        # "#u"/":u" placeholders: boto3 fills in condition values as ":v0", ":v1", ...
+        names = {f"#u{i}": name for i, name in enumerate(fields)}
+        values = {f":u{i}": value for i, value in enumerate(fields.values())}
+        assignments = ", ".join(f"#u{i} = :u{i}" for i in range(len(fields)))
+        return f"SET {assignments}", names, values
+
+    def update_total(self, year: int, month: int, fields: dict):
+        expression, names, values = self._update_expression(fields)
+
+        self.table.update_item(
+            Key={
+                "year": year,
+                "month": month,
+            },
+            UpdateExpression=expression,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    def update_total_if(
+        self, year: int, month: int, fields: dict, expected: Optional[dict]
+    ) -> bool:
+        from botocore.exceptions import ClientError
+
+        expression, names, values = self._update_expression(fields)
+
+        try:
+            self.table.update_item(
+                Key={
+                    "year": year,
+                    "month": month,
+                },
+                UpdateExpression=expression,
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ConditionExpression=self._condition(expected),
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+    def delete_total(self, year: int, month: int):
+        self.table.delete_item(
+            Key={
+                "year": year,
+                "month": month,
+            }
+        )
+
+    def delete_total_if(self, year: int, month: int, expected: dict) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.table.delete_item(
+                Key={
+                    "year": year,
+                    "month": month,
+                },
+                ConditionExpression=self._condition(expected),
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+    @staticmethod
+    def _condition(expected: Optional[dict]):
+        from boto3.dynamodb.conditions import Attr
+
+        if expected is None:
+            return Attr("year").not_exists()
+
+        conditions = [
+            Attr(name).not_exists() if value is None else Attr(name).eq(value)
+            for name, value in expected.items()
+        ]
+        condition = conditions[0]
+        for other in conditions[1:]:
+            condition &= other
+        return condition
+
+    def scan_totals(self) -> List[dict]:
+        items = []
+        kwargs = {}
+        while True:
+            response = self.table.scan(**kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def write_totals_if(self, writes: List[TotalWrite]) -> List[bool]:
+        from botocore.exceptions import ClientError
+
+        client = self.dynamodb.meta.client
+        applied = []
+
+        # TransactWriteItems takes at most 100 items and is all-or-nothing
+        for start in range(0, len(writes), 100):
+            chunk = writes[start:start + 100]
+            try:
+                client.transact_write_items(
+                    TransactItems=[self._transact_item(*write) for write in chunk]
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TransactionCanceledException":
+                    raise
+                # A failed condition cancels the whole chunk: write it item by
+                # item so only the months that changed are skipped
+                applied.extend(super().write_totals_if(chunk))
+            else:
+                applied.extend([True] * len(chunk))
+
+        return applied
+
+    def _transact_item(
+        self, year: int, month: int, fields: Optional[dict], expected: Optional[dict]
+    ) -> dict:
+        """Low-level TransactWriteItems entry for one conditional write."""
+        from boto3.dynamodb.conditions import ConditionExpressionBuilder
+        from boto3.dynamodb.types import TypeSerializer
+
+        serializer = TypeSerializer()
+        condition = ConditionExpressionBuilder().build_expression(self._condition(expected))
+        request = {
+            "TableName": self.table.name,
+            "Key": {"year": serializer.serialize(year), "month": serializer.serialize(month)},
+            "ConditionExpression": condition.condition_expression,
+            "ExpressionAttributeNames": dict(condition.attribute_name_placeholders),
+        }
+        values = dict(condition.attribute_value_placeholders)
+
+        if fields is None:
+            if values:
+                request["ExpressionAttributeValues"] = {
+                    key: serializer.serialize(value) for key, value in values.items()
+                }
+            return {"Delete": request}
+
+        expression, names, update_values = self._update_expression(fields)
+        values.update(update_values)
+        request["UpdateExpression"] = expression
+        request["ExpressionAttributeNames"].update(names)
+        request["ExpressionAttributeValues"] = {
+            key: serializer.serialize(value) for key, value in values.items()
+        }
+        return {"Update": request}
+
+
+# ---------- Local Filesystem (directory tree + SQLite) ----------
+class LocalStorage(ReceiptStorage):
+    """
+    Receipts as files under {root}/objects/{key}, monthly totals in
+    {root}/totals.sqlite3. Items are stored as JSON so the record shape
+    matches the DynamoDB item.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.db_path = os.path.join(self.root, "totals.sqlite3")
+        self._lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS monthly_total ("
+                "year INTEGER NOT NULL, "
+                "month INTEGER NOT NULL, "
+                "item TEXT NOT NULL, "
+                "PRIMARY KEY (year, month))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.objects_dir, key))
+        if not path.startswith(self.objects_dir + os.sep):
+            raise ValueError(f"Invalid receipt key: {key}")
+        return path
+
+    def put_receipt(self, key: str, data: bytes, content_type: str = "image/jpeg"):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file first so readers never see a partial image
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get_receipt(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    def list_receipts(self, prefix: str) -> List[str]:
+        # Walk only the deepest directory fully covered by the prefix
+        base = os.path.join(self.objects_dir, os.path.dirname(prefix))
+        if not os.path.isdir(base):
+            return []
+
+        keys = []
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                key = os.path.relpath(full_path, self.objects_dir).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+
+        return sorted(keys)
+
+    def list_prefixes(self, prefix: str) -> List[str]:
+        base = os.path.join(self.objects_dir, prefix)
+        if not prefix.endswith("/") or not os.path.isdir(base):
+            return []
+        return sorted(
+            f"{prefix}{name}/" for name in os.listdir(base)
+            if os.path.isdir(os.path.join(base, name))
+        )
+
+    def delete_receipt(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get_total(self, year: int, month: int) -> Optional[dict]:
+        with self._connect() as conn:
+            return self._read_item(conn, year, month)
+
+    def put_total(self, item: dict):
+        with self._lock, self._connect() as conn:
+            self._write_item(conn, item)
+
+    def put_total_if_version(self, item: dict, expected_version: Optional[str]) -> bool:
+        with self._lock, self._connect() as conn:
+            # Take the write lock up front so the check and the put are atomic
+            conn.execute("BEGIN IMMEDIATE")
+            current = self._read_item(conn, item["year"], item["month"]) or {}
+            if current.get("active_version") != expected_version:
+                return False
+            self._write_item(conn, item)
+        return True
+
+    def update_total(self, year: int, month: int, fields: dict):
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            item = self._read_item(conn, year, month) or {"year": year, "month": month}
+            item.update(fields)
+            self._write_item(conn, item)
+
+    def update_total_if(
+        self, year: int, month: int, fields: dict, expected: Optional[dict]
+    ) -> bool:
+        return self.write_totals_if([(year, month, fields, expected)])[0]
+
+    def delete_total_if(self, year: int, month: int, expected: dict) -> bool:
+        return self.write_totals_if([(year, month, None, expected)])[0]
+
+    def write_totals_if(self, writes: List[TotalWrite]) -> List[bool]:
+        # One transaction for the batch; each condition is still checked on its own
+        applied = []
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for year, month, fields, expected in writes:
+                item = self._read_item(conn, year, month)
+                if not self._matches(item, expected):
+                    applied.append(False)
+                    continue
+
+                if fields is None:
+                    conn.execute(
+                        "DELETE FROM monthly_total WHERE year = ? AND month = ?",
+                        (year, month),
+                    )
+                else:
+                    item = item or {"year": year, "month": month}
+                    item.update(fields)
+                    self._write_item(conn, item)
+                applied.append(True)
+        return applied
+
+    @staticmethod
+    def _matches(item: Optional[dict], expected: Optional[dict]) -> bool:
+        if expected is None:
+            return item is None
+        return all((item or {}).get(name) == value for name, value in expected.items())
+
+    @staticmethod
+    def _read_item(conn: sqlite3.Connection, year: int, month: int) -> Optional[dict]:
+        row = conn.execute(
+            "SELECT item FROM monthly_total WHERE year = ? AND month = ?",
+            (year, month),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _write_item(conn: sqlite3.Connection, item: dict):
+        conn.execute(
+            "INSERT OR REPLACE INTO monthly_total (year, month, item) VALUES (?, ?, ?)",
+            (item["year"], item["month"], json.dumps(item)),
+        )
+
+    def delete_total(self, year: int, month: int):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM monthly_total WHERE year = ? AND month = ?",
+                (year, month),
+            )
+
+    def scan_totals(self) -> List[dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT item FROM monthly_total").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
@@ -0,0 +1,190 @@
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import streamlit as st
+
+
+# ---------- Settings ----------
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "50"))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "5"))
+HTTP_RETRY_MODE = os.environ.get("HTTP_RETRY_MODE", "adaptive")
+HTTP_KEEPALIVE = os.environ.get("HTTP_KEEPALIVE", "1").lower() in ("1", "true", "yes")
+
+# TRANSPORT_WARMUP=1: open connections to S3/DynamoDB/inference at startup
+TRANSPORT_WARMUP = os.environ.get("TRANSPORT_WARMUP", "").lower() in ("1", "true", "yes")
+TRANSPORT_WARMUP_CONNECTIONS = int(os.environ.get("TRANSPORT_WARMUP_CONNECTIONS", "2"))
+
+
+# ---------- boto3 ----------
+def boto_config():
+    """botocore Config shared by the S3 and DynamoDB clients."""
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=HTTP_POOL_SIZE,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        retries={"mode": HTTP_RETRY_MODE, "max_attempts": HTTP_MAX_RETRIES},
+        tcp_keepalive=HTTP_KEEPALIVE,
+    )
+
+
+# ---------- Inference Client (huggingface_hub, httpx) ----------
+def hf_http_client():
+    """
+    Pooled httpx client for huggingface_hub, built from the same settings.
+    Transport retries cover connection failures only, so a request the
+    server may have processed is never sent twice.
+    """
+    import httpx
+    from huggingface_hub.utils._http import hf_request_event_hook
+
+    limits = httpx.Limits(
+        max_connections=HTTP_POOL_SIZE,
+        max_keepalive_connections=HTTP_POOL_SIZE if HTTP_KEEPALIVE else 0,
+    )
+
+    return httpx.Client(
+        transport=httpx.HTTPTransport(limits=limits, retries=HTTP_MAX_RETRIES),
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        follow_redirects=True,
+        # Keep the library's own hook, which adds request ids and offline checks
+        event_hooks={"request": [hf_request_event_hook, _count_httpx_request]},
+    )
+
+
+def configure_hf_http_backend():
+    """Make huggingface_hub share one client built from the settings above."""
+    import huggingface_hub
+
+    huggingface_hub.set_client_factory(hf_http_client)
+
+
+# ---------- Warm-up ----------
+_warmup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="transport-warmup")
+
+
+def start_warm_up(warm_up: Callable[[], None]):
+    """
+    Run warm_up in the background TRANSPORT_WARMUP_CONNECTIONS times in
+    parallel so several pooled connections are ready before the first rerun.
+    """
+    def _run():
+        try:
+            warm_up()
+        except Exception:
+            # Warm-up is best effort; the real call will surface errors
+            pass
+
+    for _ in range(TRANSPORT_WARMUP_CONNECTIONS):
+        _warmup_executor.submit(_run)
+
+
+# ---------- Connection Statistics ----------
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "connections": 0})
+_stats_lock = threading.Lock()
+
+
+def _count(host: str, field: str):
+    with _stats_lock:
+        _stats[host][field] += 1
+
+
+def _count_httpx_request(request):
+    """httpx request hook: count the request and trace new TCP connections."""
+    host = request.url.host
+    _count(host, "requests")
+
+    def trace(event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            _count(host, "connections")
+
+    request.extensions["trace"] = trace
+
+
+def _install_instrumentation():
+    """
+    Count requests per host at the urllib3 pool level and TCP/TLS handshakes
+    in the connection's connect(), which both botocore and urllib3 users go
+    through. Counting in connect() also catches a pooled connection that was
+    dropped while idle and silently reconnected. The httpx client of
+    huggingface_hub is counted by _count_httpx_request instead.
+    """
+    try:
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool
+    except ImportError:
+        return
+
+    if getattr(HTTPConnectionPool, "_receipt_instrumented", False):
+        return
+
+    counting = threading.local()
+
+    def wrap_connect(original):
+        def connect(self, *args, **kwargs):
+            # An override calling super().connect() must count only once
+            if getattr(counting, "active", False):
+                return original(self, *args, **kwargs)
+            counting.active = True
+            try:
+                _count(self.host, "connections")
+                return original(self, *args, **kwargs)
+            finally:
+                counting.active = False
+        return connect
+
+    # HTTPSConnection overrides connect, so patch each class defining it
+    for connection_class in (HTTPConnection, HTTPSConnection):
+        if "connect" in vars(connection_class):
+            connection_class.connect = wrap_connect(connection_class.connect)
+
+    original_urlopen = HTTPConnectionPool.urlopen
+
+    def urlopen(self, *args, **kwargs):
+        _count(self.host, "requests")
+        return original_urlopen(self, *args, **kwargs)
+
+    HTTPConnectionPool.urlopen = urlopen
+    HTTPConnectionPool._receipt_instrumented = True
+
+
+_install_instrumentation()
+
+
+def connection_stats() -> List[dict]:
+    """Per-host request and connection counts with the connection reuse ratio."""
+    with _stats_lock:
+        snapshot = {host: dict(counts) for host, counts in _stats.items()}
+
+    rows = []
+    for host, counts in sorted(snapshot.items()):
+        requests_made = counts["requests"]
+        reused = max(requests_made - counts["connections"], 0)
+        rows.append({
+            "host": host,
+            "requests": requests_made,
+            "new_connections": counts["connections"],
+            "reuse_ratio": reused / requests_made if requests_made else 0.0,
+        })
+    return rows
+
+
+def render_connection_stats():
+    """Sidebar table of connection reuse per host."""
+    rows = connection_stats()
+    if not rows:
+        return
+
+    with st.sidebar.expander("🔌 연결 재사용 통계", expanded=False):
+        for row in rows:
+            st.markdown(
+                f"**{row['host']}**  \n"
+                f"요청 {row['requests']}회 · 새 연결 {row['new_connections']}회 · "
+                f"재사용 {row['reuse_ratio']:.0%}"
+            )
@@ -0,0 +1,288 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Optional, Set, Tuple
+
+import streamlit as st
+
+from storage import ReceiptStorage
+
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- Write-Behind Queue ----------
+class WriteBehindQueue:
+    """
+    Durable SQLite queue of storage mutations, flushed by a background thread.
+
+    Mutations are coalesced while pending: the latest operation per receipt
+    key wins, and total updates for the same (year, month) merge into one.
+    Rows are removed only after the backend write succeeded, so pending work
+    survives restarts and is retried with exponential backoff.
+
+    Total operations carry the version their totals were computed from and
+    are applied only while the month still has that active_version, so a change
+    queued before a version switch never overwrites the new version's total.
+    """
+
+    def __init__(
+        self,
+        storage: ReceiptStorage,
+        db_path: str,
+        flush_interval: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.storage = storage
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.last_error: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._upload_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="write-behind-put")
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS receipt_ops ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "key TEXT NOT NULL UNIQUE, "
+                "op TEXT NOT NULL, "
+                "body BLOB, "
+                "content_type TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS total_ops ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "year INTEGER NOT NULL, "
+                "month INTEGER NOT NULL, "
+                "op TEXT NOT NULL, "
+                "fields TEXT, "
+                "expected_version TEXT, "
+                "UNIQUE (year, month))"
+            )
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="write-behind", daemon=True)
+        self._flusher.start()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ----- Enqueue -----
+    def put_receipt(self, key: str, data: bytes, content_type: str = "image/jpeg"):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO receipt_ops (key, op, body, content_type) VALUES (?, 'put', ?, ?)",
+                (key, data, content_type),
+            )
+        self._wake.set()
+
+    def delete_receipt(self, key: str):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO receipt_ops (key, op) VALUES (?, 'delete')",
+                (key,),
+            )
+        self._wake.set()
+
+    def update_total(self, year: int, month: int, fields: dict, expected_version: Optional[str]):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT op, fields FROM total_ops WHERE year = ? AND month = ?",
+                (year, month),
+            ).fetchone()
+            merged = json.loads(row[1]) if row and row[0] == "update" else {}
+            merged.update(fields)
+            conn.execute(
+                "INSERT OR REPLACE INTO total_ops (year, month, op, fields, expected_version) "
+                "VALUES (?, ?, 'update', ?, ?)",
+                (year, month, json.dumps(merged), expected_version),
+            )
+        self._wake.set()
+
+    def delete_total(self, year: int, month: int, expected_version: Optional[str]):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO total_ops (year, month, op, expected_version) "
+                "VALUES (?, ?, 'delete', ?)",
+                (year, month, expected_version),
+            )
+        self._wake.set()
+
+    def discard_total(self, year: int, month: int):
+        """Drop a pending total change superseded by a direct write."""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM total_ops WHERE year = ? AND month = ?", (year, month))
+
+    # ----- Pending State (read-your-writes) -----
+    def pending_receipts(self, prefix: str) -> Tuple[Set[str], Set[str]]:
+        """Return (pending puts, pending deletes) for keys under prefix."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, op FROM receipt_ops WHERE substr(key, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).fetchall()
+        puts = {key for key, op in rows if op == "put"}
+        deletes = {key for key, op in rows if op == "delete"}
+        return puts, deletes
+
+    def pending_receipt_body(self, key: str) -> Optional[bytes]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT body FROM receipt_ops WHERE key = ? AND op = 'put'",
+                (key,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def pending_total(self, year: int, month: int) -> Optional[Tuple[str, dict]]:
+        """Return (op, fields) of a pending total change, if any."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT op, fields FROM total_ops WHERE year = ? AND month = ?",
+                (year, month),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    def pending_counts(self) -> Tuple[int, int]:
+        """Return (pending receipt operations, pending total operations)."""
+        with self._connect() as conn:
+            receipts = conn.execute("SELECT COUNT(*) FROM receipt_ops").fetchone()[0]
+            totals = conn.execute("SELECT COUNT(*) FROM total_ops").fetchone()[0]
+        return receipts, totals
+
+    # ----- Flushing -----
+    def _flush_loop(self):
+        failures = 0
+        while True:
+            if failures:
+                time.sleep(min(self.max_backoff, self.flush_interval * 2 ** failures))
+            else:
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+            try:
+                self.flush()
+                failures = 0
+                self.last_error = None
+            except Exception as e:
+                failures += 1
+                self.last_error = str(e)
+
+    def flush(self):
+        """
+        Write all pending operations to the backend. Operations that fail stay
+        queued without holding back the others; a RuntimeError listing them
+        is raised at the end so the loop backs off and reports it.
+        """
+        with self._connect() as conn:
+            receipt_rows = conn.execute(
+                "SELECT id, key, op, content_type FROM receipt_ops ORDER BY id"
+            ).fetchall()
+            total_rows = conn.execute(
+                "SELECT id, year, month, op, fields, expected_version FROM total_ops ORDER BY id"
+            ).fetchall()
+
+        puts = [(row_id, key, content_type) for row_id, key, op, content_type in receipt_rows if op == "put"]
+        deletes = [(row_id, key) for row_id, key, op, _ in receipt_rows if op == "delete"]
+        failed_keys = []
+
+        if deletes:
+            failed = set(self.storage.delete_receipts([key for _, key in deletes]))
+            self._remove("receipt_ops", [row_id for row_id, key in deletes if key not in failed])
+            failed_keys.extend(key for _, key in deletes if key in failed)
+
+        if puts:
+            results = list(self._upload_pool.map(lambda p: self._flush_put(*p), puts))
+            self._remove("receipt_ops", [row_id for row_id, ok in results if ok])
+            failed_keys.extend(key for (_, key, _), (_, ok) in zip(puts, results) if not ok)
+
+        # Totals of a month whose receipts are not all stored yet wait for them
+        blocked_months = {tuple(int(part) for part in key.split("/")[1:3]) for key in failed_keys}
+        failed_totals = []
+
+        for row_id, year, month, op, fields, expected_version in total_rows:
+            if (year, month) in blocked_months:
+                continue
+            if not self._flush_total(row_id, year, month, op, fields, expected_version):
+                failed_totals.append(f"{year}년 {month}월")
+
+        if failed_keys or failed_totals:
+            raise RuntimeError(
+                f"동기화 실패 — 영수증: {', '.join(failed_keys) or '없음'}, "
+                f"합계: {', '.join(failed_totals) or '없음'}"
+            )
+
+    def _flush_total(
+        self,
+        row_id: int,
+        year: int,
+        month: int,
+        op: str,
+        fields: Optional[str],
+        expected_version: Optional[str],
+    ) -> bool:
+        """Apply one total operation. Returns False if it must be retried."""
+        # A version switch since the operation was queued makes it stale;
+        # the conditional write then fails and the operation is dropped
+        expected = {"active_version": expected_version}
+        try:
+            if op == "delete":
+                applied = self.storage.delete_total_if(year, month, expected)
+            else:
+                applied = self.storage.update_total_if(year, month, json.loads(fields), expected)
+        except Exception:
+            return False
+
+        if not applied:
+            logger.warning(
+                "Dropped queued total %s for %s-%02d: version %s is no longer active",
+                op, year, month, expected_version,
+            )
+        # The row stays queued until the write is done; a replacement queued
+        # meanwhile has a new id and survives
+        self._remove("total_ops", [row_id])
+        return True
+
+    def _flush_put(self, row_id: int, key: str, content_type: str) -> Tuple[int, bool]:
+        # Read the body here so a put replaced mid-flush uploads the newest bytes
+        body = self.pending_receipt_body(key)
+        if body is None:
+            return row_id, True
+        try:
+            self.storage.put_receipt(key, body, content_type=content_type)
+        except Exception:
+            return row_id, False
+        return row_id, True
+
+    def _remove(self, table: str, row_ids: List[int]):
+        # Deleting by id keeps operations that were replaced during the flush
+        with self._lock, self._connect() as conn:
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row_id,) for row_id in row_ids])
+
+
+# ---------- UI ----------
+def render_sync_status(queue: Optional[WriteBehindQueue]):
+    """Sidebar notice while mutations are waiting to be written."""
+    if queue is None:
+        return
+
+    receipts, totals = queue.pending_counts()
+    if not receipts and not totals:
+        return
+
+    st.sidebar.info(f"⏳ 동기화 대기 중: 영수증 {receipts}건, 합계 {totals}건")
+    if queue.last_error:
+        st.sidebar.caption(f"재시도 중 — 마지막 오류: {queue.last_error}")